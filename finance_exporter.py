@@ -5,13 +5,19 @@ Simple Yahoo Finance Prometheus Exporter using yfinance directly
 
 import time
 import yfinance as yf
-import schedule
-from prometheus_client import Gauge, generate_latest, CONTENT_TYPE_LATEST
+from yfinance.data import YfData  # internal API, keep yfinance pinned in requirements.txt
+from curl_cffi import requests as curl_requests
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 import logging
-from datetime import datetime, timedelta
-import pytz
+import json
+import math
+import signal
+import threading
+from datetime import datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
 import os
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import urlparse
 
 # Set cache location for yfinance to avoid permission issues
@@ -22,15 +28,42 @@ if 'XDG_CACHE_HOME' in os.environ:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Prometheus metrics
-stock_price = Gauge('yahoo_finance_stock_price', 'Current stock price', ['symbol'])
-stock_volume = Gauge('yahoo_finance_stock_volume', 'Current stock volume', ['symbol'])
-stock_market_cap = Gauge('yahoo_finance_market_cap', 'Market capitalization', ['symbol'])
-stock_open = Gauge('yahoo_finance_stock_open', 'Opening price', ['symbol'])
-stock_high = Gauge('yahoo_finance_stock_high', 'Daily high', ['symbol'])
-stock_low = Gauge('yahoo_finance_stock_low', 'Daily low', ['symbol'])
-stock_change_percent = Gauge('yahoo_finance_change_percent', 'Daily change percentage', ['symbol'])
-last_updated = Gauge('yahoo_finance_last_updated', 'Unix timestamp of last successful update')
+# Prometheus metrics (all gauges), exported in this order
+STOCK_PRICE = 'yahoo_finance_stock_price'
+STOCK_VOLUME = 'yahoo_finance_stock_volume'
+STOCK_MARKET_CAP = 'yahoo_finance_market_cap'
+STOCK_OPEN = 'yahoo_finance_stock_open'
+STOCK_HIGH = 'yahoo_finance_stock_high'
+STOCK_LOW = 'yahoo_finance_stock_low'
+STOCK_CHANGE_PERCENT = 'yahoo_finance_change_percent'
+LAST_UPDATED = 'yahoo_finance_last_updated'
+
+SYMBOL_METRICS = (
+    STOCK_PRICE,
+    STOCK_VOLUME,
+    STOCK_MARKET_CAP,
+    STOCK_OPEN,
+    STOCK_HIGH,
+    STOCK_LOW,
+    STOCK_CHANGE_PERCENT
+)
+
+METRIC_HELP = {
+    STOCK_PRICE: 'Current stock price',
+    STOCK_VOLUME: 'Current stock volume',
+    STOCK_MARKET_CAP: 'Market capitalization',
+    STOCK_OPEN: 'Opening price',
+    STOCK_HIGH: 'Daily high',
+    STOCK_LOW: 'Daily low',
+    STOCK_CHANGE_PERCENT: 'Daily change percentage',
+    LAST_UPDATED: 'Unix timestamp of last successful update'
+}
+
+# HELP/TYPE lines never change, so format them once
+METRIC_HEADERS = {
+    name: f'# HELP {name} {help_text}\n# TYPE {name} gauge\n'
+    for name, help_text in METRIC_HELP.items()
+}
 
 # Configuration from environment variables or mounted config files
 def load_config():
@@ -61,13 +94,15 @@ def load_config():
     metrics_port = read_config_value('METRICS_PORT', 8080, int)
     market_open_time = read_config_value('MARKET_OPEN_TIME', '09:30')
     market_close_time = read_config_value('MARKET_CLOSE_TIME', '16:00')
+    max_workers = read_config_value('MAX_WORKERS', 16, int)
     
     return {
         'SYMBOLS': symbols.split(','),
         'UPDATE_INTERVAL': update_interval,
         'METRICS_PORT': metrics_port,
         'MARKET_OPEN_TIME': market_open_time,
-        'MARKET_CLOSE_TIME': market_close_time
+        'MARKET_CLOSE_TIME': market_close_time,
+        'MAX_WORKERS': max_workers
     }
 
 # Load configuration
@@ -77,6 +112,32 @@ UPDATE_INTERVAL = config['UPDATE_INTERVAL']
 METRICS_PORT = config['METRICS_PORT']
 MARKET_OPEN_TIME = config['MARKET_OPEN_TIME']
 MARKET_CLOSE_TIME = config['MARKET_CLOSE_TIME']
+MAX_WORKERS = config['MAX_WORKERS']
+
+# Yahoo quote endpoint accepts a comma-separated list of symbols per request
+YAHOO_QUOTE_URL = 'https://query1.finance.yahoo.com/v7/finance/quote'
+QUOTE_BATCH_SIZE = 10
+
+# Share count and previous close only change once a day, so cache them
+STATIC_CACHE_TTL = 43200
+STATIC_CACHE_DIR = os.path.join(
+    os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+    'finance-exporter'
+)
+
+# Days from each weekday (Monday=0) to the next market open once today's session is over
+DAYS_TO_NEXT_OPEN = (1, 1, 1, 1, 3, 2, 1)
+
+# Longest time a repeatedly failing symbol is skipped for
+MAX_FAILURE_BACKOFF = 3600
+
+def finite_float(value):
+    """Convert a quote field to float, returning None for missing, NaN or infinite values"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
 
 class MetricsHandler(BaseHTTPRequestHandler):
     """Custom HTTP handler that only serves metrics during market hours"""
@@ -89,19 +150,19 @@ class MetricsHandler(BaseHTTPRequestHandler):
         parsed_path = urlparse(self.path)
         
         if parsed_path.path == '/metrics':
-            if self.exporter.is_market_open():
-                # Market is open - serve current metrics
-                try:
-                    output = generate_latest()
-                    self.send_response(200)
-                    self.send_header('Content-Type', CONTENT_TYPE_LATEST)
-                    self.end_headers()
-                    self.wfile.write(output)
-                except Exception as e:
-                    self.send_response(500)
-                    self.send_header('Content-Type', 'text/plain')
-                    self.end_headers()
-                    self.wfile.write(f'Error generating metrics: {e}'.encode())
+            output = self.exporter._metrics_snapshot
+            if self.exporter.is_market_open() and not output:
+                # Market is open but the first update hasn't finished yet
+                self.send_response(503)
+                self.send_header('Content-Type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(b"Metrics not available yet - waiting for first update\n")
+            elif self.exporter.is_market_open():
+                # Market is open - serve the snapshot from the last update
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE_LATEST)
+                self.end_headers()
+                self.wfile.write(output)
             else:
                 # Market is closed - return 503 Service Unavailable
                 message = "Market closed - metrics not available until next market open\n"
@@ -166,164 +227,329 @@ class MetricsHandler(BaseHTTPRequestHandler):
 class FinanceExporter:
     def __init__(self):
         # Set up timezone for market hours
-        self.et_tz = pytz.timezone('US/Eastern')
+        self.et_tz = ZoneInfo('America/New_York')
         
-    def is_market_open(self):
-        """Check if the stock market is currently open"""
-        now_et = datetime.now(self.et_tz)
+        # Shared HTTP session so all Yahoo requests reuse kept-alive connections
+        self.yf_session = curl_requests.Session(impersonate='chrome')
+        
+        # yfinance's shared data layer adds the cookie/crumb the quote endpoint requires
+        self._yf_data = YfData(session=self.yf_session)
+        
+        # Batch endpoint is skipped until this time after it rejects our credentials
+        self._batch_retry_at = 0.0
+        
+        # Long-lived worker pool for network fetches, reused across updates
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(MAX_WORKERS, len(SYMBOLS))),
+            thread_name_prefix='fetch'
+        )
         
-        # Check if it's a weekday (Monday=0, Sunday=6)
-        if now_et.weekday() >= 5:  # Saturday or Sunday
-            return False
+        # Per-symbol cache of slow-changing fields: symbol -> (fetched_at, fields)
+        self._static_cache = {}
+        
+        # Today's market hours as unix timestamps:
+        # (valid_until, open_ts, close_ts, weekday), rebuilt at each ET midnight
+        self._day_bounds = (0.0, 0.0, 0.0, 0)
+        
+        # Serialized metrics, swapped in after each update so scrapes don't walk the registry
+        self._metrics_snapshot = b''
+        
+        # Latest exported value per symbol: symbol -> {metric name: value}
+        self._values = {symbol: {} for symbol in SYMBOLS}
+        
+        # Escaped label set for each symbol, formatted once
+        self._labels = {
+            symbol: '{symbol="%s"}' % symbol.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            for symbol in SYMBOLS
+        }
+        
+        # Backoff for failing symbols: symbol -> (consecutive_failures, next_attempt_ts)
+        self._fail_state = {}
+        
+        # Set to stop the run loop
+        self._stop = threading.Event()
+        
+    def _get_day_bounds(self):
+        """Get today's market open/close timestamps, recomputing after midnight ET"""
+        bounds = self._day_bounds
+        if time.time() < bounds[0]:
+            return bounds
             
+        now_et = datetime.now(self.et_tz)
+        today = now_et.date()
+        
         # Parse market hours from environment variables
-        market_open_parts = MARKET_OPEN_TIME.split(':')
-        market_close_parts = MARKET_CLOSE_TIME.split(':')
-        
-        # Market hours from environment variables
-        market_open = now_et.replace(
-            hour=int(market_open_parts[0]), 
-            minute=int(market_open_parts[1]), 
-            second=0, 
-            microsecond=0
-        )
-        market_close = now_et.replace(
-            hour=int(market_close_parts[0]), 
-            minute=int(market_close_parts[1]), 
-            second=0, 
-            microsecond=0
+        open_hour, open_minute = (int(part) for part in MARKET_OPEN_TIME.split(':'))
+        close_hour, close_minute = (int(part) for part in MARKET_CLOSE_TIME.split(':'))
+        
+        market_open = datetime.combine(today, dtime(open_hour, open_minute), tzinfo=self.et_tz)
+        market_close = datetime.combine(today, dtime(close_hour, close_minute), tzinfo=self.et_tz)
+        next_midnight = datetime.combine(today + timedelta(days=1), dtime(), tzinfo=self.et_tz)
+        
+        bounds = (
+            next_midnight.timestamp(),
+            market_open.timestamp(),
+            market_close.timestamp(),
+            today.weekday()
         )
+        self._day_bounds = bounds
+        return bounds
+        
+    def is_market_open(self):
+        """Check if the stock market is currently open"""
+        _, open_ts, close_ts, weekday = self._get_day_bounds()
         
-        return market_open <= now_et <= market_close
+        # Weekdays only (Monday=0, Sunday=6)
+        return weekday < 5 and open_ts <= time.time() <= close_ts
         
     def get_seconds_until_market_open(self):
         """Get seconds until next market open"""
-        now_et = datetime.now(self.et_tz)
+        _, open_ts, close_ts, weekday = self._get_day_bounds()
+        now = time.time()
         
-        # If market is open now, return 0
-        if self.is_market_open():
-            return 0
+        if weekday < 5 and now <= close_ts:
+            # Weekday: either today's open is still ahead or the market is open now
+            return max(0, int(open_ts - now))
             
-        # Parse market open time from environment variable
-        market_open_parts = MARKET_OPEN_TIME.split(':')
-        
-        # Find next market open
-        next_open = now_et.replace(
-            hour=int(market_open_parts[0]), 
-            minute=int(market_open_parts[1]), 
-            second=0, 
-            microsecond=0
+        # Past close or weekend - jump straight to the next business day
+        market_open = datetime.fromtimestamp(open_ts, self.et_tz)
+        next_open = datetime.combine(
+            market_open.date() + timedelta(days=DAYS_TO_NEXT_OPEN[weekday]),
+            market_open.timetz()
         )
-        
-        # Parse market close time for comparison
-        market_close_parts = MARKET_CLOSE_TIME.split(':')
-        market_close_hour = int(market_close_parts[0])
-        
-        # If we're past market close today or it's weekend, move to next business day
-        if now_et.hour >= market_close_hour or now_et.weekday() >= 5:
-            next_open += timedelta(days=1)
-            
-        # Skip weekends
-        while next_open.weekday() >= 5:
-            next_open += timedelta(days=1)
-            
-        return int((next_open - now_et).total_seconds())
+        return int(next_open.timestamp() - now)
         
     def get_seconds_until_market_close(self):
         """Get seconds until market close today"""
-        now_et = datetime.now(self.et_tz)
+        _, _, close_ts, _ = self._get_day_bounds()
+        return max(0, int(close_ts - time.time()))
         
-        # Parse market close time from environment variable
-        market_close_parts = MARKET_CLOSE_TIME.split(':')
+    def _static_cache_path(self, symbol):
+        return os.path.join(STATIC_CACHE_DIR, f"{symbol}.json")
         
-        market_close = now_et.replace(
-            hour=int(market_close_parts[0]), 
-            minute=int(market_close_parts[1]), 
-            second=0, 
-            microsecond=0
-        )
+    def get_static_fields(self, symbol, fast_info):
+        """Get share count and previous close, refreshed at most once per trading day"""
+        now = time.time()
+        today = datetime.now(self.et_tz).date().isoformat()
         
-        if now_et >= market_close:
-            return 0
+        cached = self._static_cache.get(symbol)
+        if cached is None:
+            # Warm start from the on-disk cache if a previous run left one
+            try:
+                with open(self._static_cache_path(symbol), 'r') as f:
+                    data = json.load(f)
+                cached = (data['fetched_at'], data['fields'])
+                self._static_cache[symbol] = cached
+            except (OSError, ValueError, KeyError):
+                pass
+                
+        if cached is not None:
+            fetched_at, fields = cached
+            if now - fetched_at < STATIC_CACHE_TTL and fields.get('date') == today and 'regularMarketPreviousClose' in fields:
+                return fields
+                
+        # Read shares rather than market_cap, which is frozen at the fetch-time price
+        # and falls back to the slow ticker.info lookup for symbols without a share count
+        try:
+            shares = fast_info.shares
+        except Exception as e:
+            logger.warning(f"No share count for {symbol}: {e}")
+            shares = None
             
-        return int((market_close - now_et).total_seconds())
+        fields = {
+            'date': today,
+            'shares': shares,
+            # Official close, matching the batch path - previous_close is the last after-hours bar
+            'regularMarketPreviousClose': fast_info.regular_market_previous_close,
+        }
+        self._static_cache[symbol] = (now, fields)
+        
+        try:
+            os.makedirs(STATIC_CACHE_DIR, exist_ok=True)
+            with open(self._static_cache_path(symbol), 'w') as f:
+                json.dump({'fetched_at': now, 'fields': fields}, f)
+        except OSError as e:
+            logger.warning(f"Error writing static cache for {symbol}: {e}")
+            
+        return fields
         
     def get_quote(self, symbol):
         """Get stock quote directly from Yahoo Finance using yfinance"""
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            hist = ticker.history(period="1d")
+            ticker = yf.Ticker(symbol, session=self.yf_session)
+            # fast_info avoids the slow quoteSummary lookup behind ticker.info
+            fast_info = ticker.fast_info
+            price = fast_info.last_price
             
-            if hist.empty:
-                logger.warning(f"No historical data for {symbol}")
+            if price is None:
+                logger.warning(f"No price data for {symbol}")
                 return None
                 
-            latest = hist.iloc[-1]
+            static = self.get_static_fields(symbol, fast_info)
+            shares = static.get('shares')
             
             return {
                 'symbol': symbol,
-                'currentPrice': info.get('currentPrice', latest['Close']),
-                'open': latest['Open'],
-                'high': latest['High'],
-                'low': latest['Low'],
-                'volume': latest['Volume'],
-                'marketCap': info.get('marketCap'),
-                'previousClose': info.get('previousClose', latest['Close']),
+                'currentPrice': price,
+                'open': fast_info.open,
+                'high': fast_info.day_high,
+                'low': fast_info.day_low,
+                'volume': fast_info.last_volume,
+                'marketCap': shares * price if shares else None,
+                'previousClose': static.get('regularMarketPreviousClose') or price,
             }
             
         except Exception as e:
             logger.error(f"Error fetching {symbol}: {e}")
             return None
     
+    def _fetch_quote_chunk(self, chunk):
+        """Get quotes for up to QUOTE_BATCH_SIZE symbols in a single request"""
+        quotes = {}
+        
+        try:
+            data = self._yf_data.get_raw_json(
+                YAHOO_QUOTE_URL,
+                params={'symbols': ','.join(chunk), 'formatted': 'false'},
+                timeout=10
+            )
+            results = data.get('quoteResponse', {}).get('result') or []
+        except Exception as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if status in (401, 403):
+                # Don't keep hammering the endpoint every cycle if it won't authorize us
+                self._batch_retry_at = time.time() + MAX_FAILURE_BACKOFF
+                logger.warning(f"Batch quote endpoint returned {status}, using per-symbol lookups for {MAX_FAILURE_BACKOFF}s")
+            else:
+                logger.warning(f"Batch quote request failed for {','.join(chunk)}: {e}")
+            return quotes
+            
+        for result in results:
+            symbol = result.get('symbol')
+            price = result.get('regularMarketPrice')
+            if symbol not in chunk or price is None:
+                continue
+                
+            quotes[symbol] = {
+                'symbol': symbol,
+                'currentPrice': price,
+                'open': result.get('regularMarketOpen'),
+                'high': result.get('regularMarketDayHigh'),
+                'low': result.get('regularMarketDayLow'),
+                'volume': result.get('regularMarketVolume'),
+                'marketCap': result.get('marketCap'),
+                'previousClose': result.get('regularMarketPreviousClose', price),
+            }
+            
+        return quotes
+        
+    def fetch_quotes_batch(self, symbols):
+        """Get quotes for many symbols using concurrent batched Yahoo quote requests"""
+        if time.time() < self._batch_retry_at:
+            return {}
+            
+        chunks = [symbols[i:i + QUOTE_BATCH_SIZE] for i in range(0, len(symbols), QUOTE_BATCH_SIZE)]
+        
+        quotes = {}
+        for chunk_quotes in self._executor.map(self._fetch_quote_chunk, chunks):
+            quotes.update(chunk_quotes)
+        return quotes
+    
+    def _build_snapshot(self, updated_at):
+        """Format the latest values as Prometheus exposition text"""
+        lines = []
+        
+        for name in SYMBOL_METRICS:
+            lines.append(METRIC_HEADERS[name])
+            for symbol in SYMBOLS:
+                value = self._values[symbol].get(name)
+                if value is not None:
+                    lines.append(f'{name}{self._labels[symbol]} {value!r}\n')
+                    
+        lines.append(METRIC_HEADERS[LAST_UPDATED])
+        lines.append(f'{LAST_UPDATED} {updated_at!r}\n')
+        
+        # Keep exporting the default process_*/python_* collectors from the global registry
+        return ''.join(lines).encode() + generate_latest()
+        
+    def _record_failure(self, symbol, now):
+        """Back off exponentially from a symbol after consecutive failures"""
+        failures = self._fail_state.get(symbol, (0, 0))[0] + 1
+        backoff = min(MAX_FAILURE_BACKOFF, UPDATE_INTERVAL * 2 ** failures)
+        self._fail_state[symbol] = (failures, now + backoff)
+        logger.warning(f"Skipping {symbol} for {backoff}s after {failures} consecutive failure(s)")
+        
     def update_metrics(self):
         """Update Prometheus metrics for all symbols"""            
         logger.info("Updating metrics...")
         
-        for symbol in SYMBOLS:
+        # Skip symbols that are still backing off after repeated failures
+        now = time.time()
+        symbols = [symbol for symbol in SYMBOLS if now >= self._fail_state.get(symbol, (0, 0))[1]]
+        
+        # Fetch quotes in batches, a handful of symbols per request
+        quotes = self.fetch_quotes_batch(symbols)
+        
+        # Fall back to per-symbol yfinance lookups for anything the batch missed
+        missing = [symbol for symbol in symbols if symbol not in quotes]
+        if missing:
+            futures = {self._executor.submit(self.get_quote, symbol): symbol for symbol in missing}
+            for future in as_completed(futures):
+                quotes[futures[future]] = future.result()
+        
+        # Apply results in configured order so logs stay readable
+        for symbol in symbols:
             try:
-                quote = self.get_quote(symbol)
+                quote = quotes.get(symbol)
                 
                 if quote:
+                    self._fail_state.pop(symbol, None)
+                    values = self._values[symbol]
+                    
                     # Update price metrics
-                    price = quote.get('currentPrice')
+                    price = finite_float(quote.get('currentPrice'))
                     if price:
-                        stock_price.labels(symbol=symbol).set(float(price))
+                        values[STOCK_PRICE] = price
                         
                     # Update OHLV metrics
-                    if quote.get('open'):
-                        stock_open.labels(symbol=symbol).set(float(quote['open']))
-                    if quote.get('high'):
-                        stock_high.labels(symbol=symbol).set(float(quote['high']))
-                    if quote.get('low'):
-                        stock_low.labels(symbol=symbol).set(float(quote['low']))
+                    open_price = finite_float(quote.get('open'))
+                    if open_price:
+                        values[STOCK_OPEN] = open_price
+                    high = finite_float(quote.get('high'))
+                    if high:
+                        values[STOCK_HIGH] = high
+                    low = finite_float(quote.get('low'))
+                    if low:
+                        values[STOCK_LOW] = low
                         
                     # Update volume metric
-                    volume = quote.get('volume')
+                    volume = finite_float(quote.get('volume'))
                     if volume:
-                        stock_volume.labels(symbol=symbol).set(float(volume))
+                        values[STOCK_VOLUME] = volume
                         
                     # Update market cap
-                    market_cap = quote.get('marketCap')
+                    market_cap = finite_float(quote.get('marketCap'))
                     if market_cap:
-                        stock_market_cap.labels(symbol=symbol).set(float(market_cap))
+                        values[STOCK_MARKET_CAP] = market_cap
                         
                     # Calculate change percentage
-                    prev_close = quote.get('previousClose')
+                    prev_close = finite_float(quote.get('previousClose'))
                     if price and prev_close:
-                        change_pct = ((float(price) - float(prev_close)) / float(prev_close)) * 100
-                        stock_change_percent.labels(symbol=symbol).set(change_pct)
+                        change_pct = (price - prev_close) / prev_close * 100.0
+                        values[STOCK_CHANGE_PERCENT] = change_pct
                         
                     logger.info(f"Updated {symbol}: ${price}")
                     
                 else:
                     logger.warning(f"No data received for {symbol}")
+                    self._record_failure(symbol, now)
                     
             except Exception as e:
                 logger.error(f"Error processing {symbol}: {e}")
+                self._record_failure(symbol, now)
         
-        # Update the last_updated timestamp
-        last_updated.set(time.time())
+        # Publish the new snapshot along with the last_updated timestamp
+        self._metrics_snapshot = self._build_snapshot(time.time())
         logger.info("Metrics update complete")
     
     def run(self):
@@ -332,40 +558,36 @@ class FinanceExporter:
         logger.info(f"Monitoring symbols: {', '.join(SYMBOLS)}")
         logger.info("Smart scheduler: Updates only during market hours, sleeps when closed")
         
+        # Wake any sleep immediately on SIGTERM so shutdown is graceful
+        signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+        
         # Start custom HTTP server that respects market hours
         def handler_factory(*args, **kwargs):
             return MetricsHandler(self, *args, **kwargs)
         
-        server = HTTPServer(('', METRICS_PORT), handler_factory)
+        server = ThreadingHTTPServer(('', METRICS_PORT), handler_factory)
         
         # Start server in a separate thread to avoid blocking
-        import threading
         server_thread = threading.Thread(target=server.serve_forever, daemon=True)
         server_thread.start()
         
         logger.info(f"Market-aware metrics server started on :{METRICS_PORT}")
         logger.info(f"Metrics available at http://localhost:{METRICS_PORT}/metrics (during market hours only)")
         
-        while True:
+        while not self._stop.is_set():
             if self.is_market_open():
                 logger.info("Market is open - starting active monitoring")
                 
-                # Clear any existing schedules
-                schedule.clear()
-                
-                # Schedule updates based on configured interval during market hours
-                schedule.every(UPDATE_INTERVAL).seconds.do(self.update_metrics)
-                
-                # Run initial update
-                self.update_metrics()
-                
-                # Keep updating until market closes
-                while self.is_market_open():
-                    schedule.run_pending()
-                    time.sleep(1)
+                # Update on a fixed cadence, sleeping until each next deadline
+                next_update = time.monotonic()
+                while self.is_market_open() and not self._stop.is_set():
+                    self.update_metrics()
+                    # Don't try to catch up if an update overran its interval
+                    next_update = max(next_update + UPDATE_INTERVAL, time.monotonic())
+                    self._stop.wait(timeout=max(0, next_update - time.monotonic()))
                     
-                logger.info("Market closed - stopping active monitoring")
-                schedule.clear()
+                if not self._stop.is_set():
+                    logger.info("Market closed - stopping active monitoring")
                 
             else:
                 # Market is closed - sleep until next open
@@ -375,11 +597,12 @@ class FinanceExporter:
                 
                 logger.info(f"Market closed - sleeping for {sleep_hours}h {sleep_minutes % 60}m until next open")
                 
-                # Sleep in chunks to allow for graceful shutdown
-                while sleep_seconds > 0 and not self.is_market_open():
-                    chunk = min(300, sleep_seconds)  # Sleep max 5 minutes at a time
-                    time.sleep(chunk)
-                    sleep_seconds -= chunk
+                # Single wait for the whole closed period, cut short by shutdown
+                self._stop.wait(timeout=max(1, sleep_seconds))
+                
+        logger.info("Shutting down")
+        server.shutdown()
+        self._executor.shutdown(wait=False)
 
 if __name__ == "__main__":
     exporter = FinanceExporter()